@@ -1,10 +1,92 @@
-import hashlib
 import json
+import math
+import sys
 import time
 import uuid
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, NamedTuple, Optional
+import numpy as np
 import streamlit as st
 
+import mining
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional accelerator for JSON output
+    orjson = None
+
+# Ledger amounts are kept as integer micro-coins so balances add up exactly
+_SCALE = 1_000_000
+# Largest amount one transaction may move; 1e15 micro-coins still fits a float exactly
+_MAX_AMOUNT = 1_000_000_000
+
+
+def _to_units(amount: float) -> int:
+    if not -_MAX_AMOUNT <= amount <= _MAX_AMOUNT:  # also rejects nan and inf
+        raise ValueError(f"amount must be a number of at most {_MAX_AMOUNT:,} coins, got {amount}")
+    return int(round(amount * _SCALE))
+
+
+def _sum_by_id(ids: np.ndarray, units: np.ndarray, k: int) -> np.ndarray:
+    """Exact int64 total of units per id; np.bincount would accumulate in float64."""
+    totals = np.zeros(k, dtype=np.int64)
+    np.add.at(totals, ids, units)
+    return totals
+
+
+# ------------------------
+# Block serialization
+# ------------------------
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+def _encode_num(value: Any) -> str:
+    if type(value) is int:
+        return int.__repr__(value)
+    if type(value) is float and math.isfinite(value):
+        return float.__repr__(value)
+    raise TypeError(value)
+
+
+def _canon(block: Dict[str, Any]) -> bytes:
+    """Same bytes as json.dumps(block, sort_keys=True) for the standard block shape.
+
+    Keys are written in their sorted order directly; anything unexpected (extra
+    keys, other value types) falls back to json.dumps.
+    """
+    try:
+        if len(block) != 5:
+            raise KeyError
+        txs = []
+        for tx in block["transactions"]:
+            if len(tx) != 3:
+                raise KeyError
+            txs.append('{"amount": %s, "recipient": %s, "sender": %s}' % (
+                _encode_num(tx["amount"]), _encode_str(tx["recipient"]), _encode_str(tx["sender"])))
+        out = '{"index": %s, "previous_hash": %s, "proof": %s, "timestamp": %s, "transactions": [%s]}' % (
+            _encode_num(block["index"]), _encode_str(block["previous_hash"]), _encode_num(block["proof"]),
+            _encode_num(block["timestamp"]), ", ".join(txs))
+    except (KeyError, TypeError):
+        return json.dumps(block, sort_keys=True).encode()
+    return out.encode()
+
+
+class BlockDisplay(NamedTuple):
+    """Strings shown for a block, formatted once when it joins the chain."""
+    header: str
+    time: str
+
+
+def _to_json(obj: Any) -> str:
+    """Compact JSON text; st.json passes strings to the browser without re-serializing."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:  # e.g. integers wider than 64 bits in an uploaded chain
+            pass
+    return json.dumps(obj)
+
+
 # ------------------------
 # Blockchain Class
 # ------------------------
@@ -13,6 +95,21 @@ class Blockchain:
         self.chain: List[Dict[str, Any]] = []
         self.current_transactions: List[Dict[str, Any]] = []
         self.difficulty = difficulty
+        # Running balances (in micro-coins) for mined blocks and for the pending pool
+        self._balances: Dict[str, int] = defaultdict(int)
+        self._pending_delta: Dict[str, int] = defaultdict(int)
+        # Dense address ids and columnar storage of every transaction
+        self._addr_to_id: Dict[str, int] = {}
+        self._id_to_addr: List[str] = []
+        # Addresses seen so far, other than the "0" mining reward source, in first-seen order
+        self.wallets: List[str] = []
+        self._reset_columns()
+        # (header, formatted time) and hash per block, computed once when the block is added
+        self.block_display: List[BlockDisplay] = []
+        self.block_hashes: List[str] = []
+        # This instance and how many times it has changed; see state_key
+        self._uid = uuid.uuid4().hex
+        self._version = 0
         # Create genesis block
         self.new_block(proof=100, previous_hash="1")
 
@@ -20,68 +117,196 @@ class Blockchain:
         block = {
             "index": len(self.chain) + 1,
             "timestamp": time.time(),
-            "transactions": self.current_transactions.copy(),
+            "transactions": self.current_transactions,
             "proof": proof,
-            "previous_hash": previous_hash or self.hash(self.chain[-1]),
+            "previous_hash": previous_hash or self.block_hashes[-1],
         }
-        self.current_transactions = []  # clear pending after adding
+        self.current_transactions = []  # block takes ownership of the pending list
+        self._version += 1
         self.chain.append(block)
+        self.block_display.append(self._display_strings(block))
+        self.block_hashes.append(self.hash(block))
+        for user, delta in self._pending_delta.items():
+            self._balances[user] += delta
+        self._pending_delta.clear()
         return block
 
     def new_transaction(self, sender: str, recipient: str, amount: float) -> int:
+        units = _to_units(amount)  # validate before touching any state
+        sender_id, recipient_id = self._address_id(sender), self._address_id(recipient)
+        # Store the canonical address objects, so every tx of a wallet shares one string
+        sender, recipient = self._id_to_addr[sender_id], self._id_to_addr[recipient_id]
         tx = {
             "sender": sender,
             "recipient": recipient,
             "amount": amount,
         }
         self.current_transactions.append(tx)
+        self._version += 1
+        self._pending_delta[sender] -= units
+        self._pending_delta[recipient] += units
+        self._append_column_tx(sender_id, recipient_id, units)
         return self.last_block["index"] + 1
 
+    def _reset_columns(self, capacity: int = 64) -> None:
+        self._addr_to_id.clear()
+        self._id_to_addr.clear()
+        self.wallets.clear()
+        self._tx_sender = np.empty(capacity, dtype=np.uint32)
+        self._tx_recipient = np.empty(capacity, dtype=np.uint32)
+        self._tx_amount = np.empty(capacity, dtype=np.int64)
+        self._tx_count = 0
+
+    def _address_id(self, address: str) -> int:
+        aid = self._addr_to_id.get(address)
+        if aid is None:
+            if type(address) is str:
+                address = sys.intern(address)
+            aid = len(self._id_to_addr)
+            self._addr_to_id[address] = aid
+            self._id_to_addr.append(address)
+            if address != "0":
+                self.wallets.append(address)
+        return aid
+
+    def _append_column_tx(self, sender_id: int, recipient_id: int, units: int) -> None:
+        n = self._tx_count
+        if n == len(self._tx_amount):
+            # Double on full so appends stay amortised O(1)
+            for name in ("_tx_sender", "_tx_recipient", "_tx_amount"):
+                old = getattr(self, name)
+                grown = np.empty(2 * n, dtype=old.dtype)
+                grown[:n] = old
+                setattr(self, name, grown)
+        self._tx_sender[n] = sender_id
+        self._tx_recipient[n] = recipient_id
+        self._tx_amount[n] = units
+        self._tx_count = n + 1
+
+    def _column_totals(self, start: int, stop: int) -> np.ndarray:
+        """Net micro-coins per address id over transactions [start, stop)."""
+        k = len(self._id_to_addr)
+        amount = self._tx_amount[start:stop]
+        return _sum_by_id(self._tx_recipient[start:stop], amount, k) - _sum_by_id(self._tx_sender[start:stop], amount, k)
+
+    @staticmethod
+    def _display_strings(block: Dict[str, Any]) -> BlockDisplay:
+        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(block["timestamp"]))
+        return BlockDisplay(f"Block {block['index']}", time_str)
+
     @staticmethod
     def hash(block: Dict[str, Any]) -> str:
-        block_string = json.dumps(block, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
+        return mining.sha256(_canon(block)).hexdigest()
+
+    @property
+    def state_key(self) -> str:
+        """Names this instance and its current contents, pending pool included.
+
+        st.cache_data is shared by every session, and two sessions can hold the
+        same chain with different pending transactions, so render caches that
+        read the pending pool are keyed on this rather than on the tip hash.
+        """
+        return f"{self._uid}:{self._version}"
 
     @property
     def last_block(self) -> Dict[str, Any]:
         return self.chain[-1]
 
     def proof_of_work(self, last_proof: int) -> int:
-        proof = 0
-        while not self.valid_proof(last_proof, proof):
-            proof += 1
-        return proof
+        return mining.find_proof(last_proof, self.difficulty)
+
+    @property
+    def difficulty(self) -> int:
+        return self._difficulty
+
+    @difficulty.setter
+    def difficulty(self, value: int) -> None:
+        self._difficulty = value
+        self._valid_proof = mining.compile_valid_proof(value)
 
     def valid_proof(self, last_proof: int, proof: int) -> bool:
-        guess = f"{last_proof}{proof}".encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:self.difficulty] == "0" * self.difficulty
+        return self._valid_proof(last_proof, proof)
+
+    def replace_chain(self, chain: List[Dict[str, Any]]) -> None:
+        # Derive everything before swapping, so a malformed chain leaves the old one intact
+        display = [self._display_strings(block) for block in chain]
+        hashes = [self.hash(block) for block in chain]
+        old_chain, self.chain = self.chain, chain
+        try:
+            self.rebuild_balances()
+        except Exception:
+            self.chain = old_chain
+            self.rebuild_balances()
+            raise
+        self.block_display = display
+        self.block_hashes = hashes
+
+    def rebuild_balances(self) -> None:
+        self._version += 1
+        # Gather ids and amounts for every transaction, confirmed then pending,
+        # then fill the columns in one go rather than appending row by row.
+        self._reset_columns()
+        address_id, id_to_addr = self._address_id, self._id_to_addr
+        sender_ids: List[int] = []
+        recipient_ids: List[int] = []
+        units: List[int] = []
+
+        def gather(txs: List[Dict[str, Any]]) -> None:
+            for tx in txs:
+                sender_id, recipient_id = address_id(tx["sender"]), address_id(tx["recipient"])
+                # Loaded chains repeat a fresh str per occurrence; share the canonical one
+                tx["sender"], tx["recipient"] = id_to_addr[sender_id], id_to_addr[recipient_id]
+                sender_ids.append(sender_id)
+                recipient_ids.append(recipient_id)
+                units.append(_to_units(tx["amount"]))
 
-    def compute_balance(self, address: str) -> float:
-        balance = 0.0
         for block in self.chain:
-            for tx in block["transactions"]:
-                if tx["recipient"] == address:
-                    balance += tx["amount"]
-                if tx["sender"] == address:
-                    balance -= tx["amount"]
-        for tx in self.current_transactions:
-            if tx["recipient"] == address:
-                balance += tx["amount"]
-            if tx["sender"] == address:
-                balance -= tx["amount"]
-        return balance
+            gather(block["transactions"])
+        n_confirmed = len(units)
+        gather(self.current_transactions)
+        n = self._tx_count = len(units)
+        capacity = max(64, 2 * n)  # headroom so the next appends do not reallocate at once
+        for name, values in (("_tx_sender", sender_ids), ("_tx_recipient", recipient_ids), ("_tx_amount", units)):
+            column = np.empty(capacity, dtype=getattr(self, name).dtype)
+            column[:n] = values
+            setattr(self, name, column)
+        confirmed = self._column_totals(0, n_confirmed)
+        pending = self._column_totals(n_confirmed, self._tx_count)
+        self._balances = defaultdict(int, zip(self._id_to_addr, confirmed.tolist()))
+        self._pending_delta = defaultdict(int, zip(self._id_to_addr, pending.tolist()))
+
+    def compute_balance(self, address: str) -> float:
+        return (self._balances.get(address, 0) + self._pending_delta.get(address, 0)) / _SCALE
 
     def all_balances(self) -> Dict[str, float]:
-        users = set()
-        for block in self.chain:
-            for tx in block["transactions"]:
-                users.add(tx["sender"])
-                users.add(tx["recipient"])
-        for tx in self.current_transactions:
-            users.add(tx["sender"])
-            users.add(tx["recipient"])
-        return {user: self.compute_balance(user) for user in users if user != "0"}
+        return {user: self.compute_balance(user) for user in self.wallets}
+
+
+# ------------------------
+# Cached render helpers
+# ------------------------
+@st.cache_data(show_spinner=False, max_entries=8)
+def _serialize_chain(n_blocks: int, tip_hash: str, _chain: List[Dict[str, Any]]) -> bytes:
+    # Keyed on chain length + tip hash; the chain itself is not hashed.
+    # Returned as bytes so download_button sends it without re-encoding.
+    if orjson is not None:
+        try:
+            return orjson.dumps(_chain, option=orjson.OPT_INDENT_2)
+        except TypeError:  # e.g. integers wider than 64 bits in an uploaded chain
+            pass
+    return json.dumps(_chain, indent=2).encode()
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _block_txs_json(index: int, block_hash: str, _block: Dict[str, Any]) -> str:
+    # Mined blocks never change, so their transactions are serialized once.
+    return _to_json(_block["transactions"])
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _balances_markdown(state_key: str, _bc: "Blockchain") -> str:
+    # Balances only change when a block or a pending transaction is added.
+    return "\n\n".join(f"**{user}** → {bal} coins" for user, bal in _bc.all_balances().items())
 
 
 # ------------------------
@@ -93,7 +318,7 @@ st.set_page_config(page_title="Classroom Crypto", layout="wide")
 if "blockchain" not in st.session_state:
     st.session_state.blockchain = Blockchain(difficulty=3)
 if "node_id" not in st.session_state:
-    st.session_state.node_id = str(uuid.uuid4()).replace("-", "")
+    st.session_state.node_id = uuid.uuid4().hex
 
 bc: Blockchain = st.session_state.blockchain
 node_id: str = st.session_state.node_id
@@ -113,12 +338,15 @@ with col1:
     with st.form("tx_form", clear_on_submit=True):
         sender = st.text_input("Sender", value=node_id)
         recipient = st.text_input("Recipient")
-        amount = st.number_input("Amount", min_value=0.0, step=1.0)
+        amount = st.number_input("Amount", min_value=0.0, max_value=float(_MAX_AMOUNT), step=1.0)
         submitted = st.form_submit_button("Add Transaction")
         if submitted:
             if sender and recipient and amount > 0:
-                index = bc.new_transaction(sender=sender, recipient=recipient, amount=amount)
-                st.success(f"✅ Transaction will be added in Block {index} after mining")
+                try:
+                    index = bc.new_transaction(sender=sender, recipient=recipient, amount=amount)
+                    st.success(f"✅ Transaction will be added in Block {index} after mining")
+                except ValueError as e:
+                    st.error(f"Transaction rejected: {e}")
             else:
                 st.error("Please enter valid sender, recipient and amount.")
 
@@ -132,39 +360,45 @@ with col1:
             bc.new_transaction(sender="0", recipient=node_id, amount=1)
             new_block = bc.new_block(proof)
         st.success(f"🎉 Block #{new_block['index']} mined successfully!")
-        st.json(new_block)
+        st.json(_to_json(new_block))
 
 # ------------------------
 # Right column - Chain & Balances
 # ------------------------
 with col2:
     st.subheader("📦 Recent Blocks")
-    for block in reversed(bc.chain[-5:]):
-        with st.expander(f"Block {block['index']}"):
-            st.write("⏰", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(block["timestamp"])))
-            st.json(block["transactions"])
+    recent = zip(bc.chain[-5:], bc.block_display[-5:], bc.block_hashes[-5:])
+    for block, display, block_hash in reversed(list(recent)):
+        with st.expander(display.header):
+            st.write("⏰", display.time)
+            # Expanders render their body even when collapsed, so the JSON is
+            # only built and sent once the viewer asks for it.
+            n_txs = len(block["transactions"])
+            if not n_txs:
+                st.caption("No transactions")
+            elif st.toggle(f"Show transactions ({n_txs})", key=f"show_txs_{block_hash}"):
+                st.json(_block_txs_json(block["index"], block_hash, block))
 
     st.markdown("---")
     st.subheader("💰 Balances")
-    balances = bc.all_balances()
-    if balances:
-        for user, bal in balances.items():
-            st.write(f"**{user}** → {bal} coins")
+    balances_md = _balances_markdown(bc.state_key, bc)
+    if balances_md:
+        st.markdown(balances_md)
     else:
         st.info("No balances yet. Add and mine some transactions!")
 
     st.markdown("---")
     st.subheader("⬇️ Export / Import Blockchain")
-    chain_json = json.dumps(bc.chain, indent=2)
-    st.download_button("Download Blockchain", data=chain_json, file_name="classroom_chain.json", mime="application/json")
+    chain_bytes = _serialize_chain(len(bc.chain), bc.block_hashes[-1], bc.chain)
+    st.download_button("Download Blockchain", data=chain_bytes, file_name="classroom_chain.json", mime="application/json")
     uploaded = st.file_uploader("Upload JSON", type=["json"])
     if uploaded:
         try:
             loaded = json.loads(uploaded.read())
-            if isinstance(loaded, list):
-                bc.chain = loaded
+            if isinstance(loaded, list) and loaded:
+                bc.replace_chain(loaded)
                 st.success("✅ Blockchain replaced successfully!")
             else:
-                st.error("Uploaded JSON must be a list of blocks.")
+                st.error("Uploaded JSON must be a non-empty list of blocks.")
         except Exception as e:
             st.error(f"Failed to load JSON: {e}")
@@ -0,0 +1,308 @@
+import ctypes
+import hashlib
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# OpenSSL-backed hashlib picks SHA-NI/AVX2 kernels at runtime on its own;
+# every SHA-256 in the app goes through this one binding.
+sha256 = hashlib.sha256
+
+try:
+    import numba
+    import numpy as np
+except ImportError:  # numba is an optional accelerator
+    numba = None
+
+# ------------------------
+# Native backend (SHA-NI, or 8-way AVX2)
+# ------------------------
+_LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "libproofofwork.so")
+
+
+def _load_native() -> Optional[ctypes.CDLL]:
+    """Load libproofofwork (built from pow_sha_ni.c) if the CPU has SHA-NI or AVX2."""
+    try:
+        lib = ctypes.CDLL(_LIB_PATH)
+    except OSError:
+        return None
+    lib.pow_backend.restype = ctypes.c_int
+    if not lib.pow_backend():
+        return None
+    lib.find_proof.argtypes = [ctypes.c_uint64, ctypes.c_int]
+    lib.find_proof.restype = ctypes.c_uint64
+    lib.search_proof.argtypes = [ctypes.c_uint64, ctypes.c_int, ctypes.c_uint64, ctypes.c_uint64,
+                                 ctypes.POINTER(ctypes.c_uint64)]
+    lib.search_proof.restype = None
+    lib.find_proof_with.argtypes = [ctypes.c_int, ctypes.c_uint64, ctypes.c_int]
+    lib.find_proof_with.restype = ctypes.c_uint64
+    return lib
+
+
+def _usable_cpus() -> int:
+    """CPUs this process may run on; os.cpu_count() ignores affinity and cpuset limits."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+_native = _load_native()
+_N_WORKERS = _usable_cpus()
+
+
+def _find_proof_native(last_proof: int, difficulty: int) -> int:
+    if _N_WORKERS == 1:
+        return _native.find_proof(last_proof, difficulty)
+    # ctypes releases the GIL for the duration of each call, so the workers
+    # search their interleaved nonce ranges in parallel and share `best`.
+    best = ctypes.c_uint64(2**64 - 1)
+    workers = [
+        threading.Thread(target=_native.search_proof,
+                         args=(last_proof, difficulty, i, _N_WORKERS, ctypes.byref(best)))
+        for i in range(_N_WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return best.value
+
+
+# ------------------------
+# Numba backend
+# ------------------------
+_MASK32 = 0xFFFFFFFF
+_BATCH = 1 << 16
+# Streamlit mines from one thread per session, and Numba's workqueue threading
+# layer aborts the process if two parallel regions run at once. A search
+# already uses every core, so serializing them costs no throughput.
+_numba_lock = threading.Lock()
+
+if numba is not None:
+    _K = np.array([
+        0x428A2F98, 0x71374491, 0xB5C0FBCF, 0xE9B5DBA5, 0x3956C25B, 0x59F111F1, 0x923F82A4, 0xAB1C5ED5,
+        0xD807AA98, 0x12835B01, 0x243185BE, 0x550C7DC3, 0x72BE5D74, 0x80DEB1FE, 0x9BDC06A7, 0xC19BF174,
+        0xE49B69C1, 0xEFBE4786, 0x0FC19DC6, 0x240CA1CC, 0x2DE92C6F, 0x4A7484AA, 0x5CB0A9DC, 0x76F988DA,
+        0x983E5152, 0xA831C66D, 0xB00327C8, 0xBF597FC7, 0xC6E00BF3, 0xD5A79147, 0x06CA6351, 0x14292967,
+        0x27B70A85, 0x2E1B2138, 0x4D2C6DFC, 0x53380D13, 0x650A7354, 0x766A0ABB, 0x81C2C92E, 0x92722C85,
+        0xA2BFE8A1, 0xA81A664B, 0xC24B8B70, 0xC76C51A3, 0xD192E819, 0xD6990624, 0xF40E3585, 0x106AA070,
+        0x19A4C116, 0x1E376C08, 0x2748774C, 0x34B0BCB5, 0x391C0CB3, 0x4ED8AA4A, 0x5B9CCA4F, 0x682E6FF3,
+        0x748F82EE, 0x78A5636F, 0x84C87814, 0x8CC70208, 0x90BEFFFA, 0xA4506CEB, 0xBEF9A3F7, 0xC67178F2,
+    ], dtype=np.int64)
+    _IV = np.array([
+        0x6A09E667, 0xBB67AE85, 0x3C6EF372, 0xA54FF53A, 0x510E527F, 0x9B05688C, 0x1F83D9AB, 0x5BE0CD19,
+    ], dtype=np.int64)
+
+    # Words are held in int64 and masked back to 32 bits after each add.
+    @numba.njit(cache=True, inline="always")
+    def _rotr(x, n):
+        return ((x >> n) | (x << (32 - n))) & _MASK32
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _compress(state, block, offset, w, k):
+        for t in range(16):
+            i = offset + 4 * t
+            w[t] = (np.int64(block[i]) << 24) | (np.int64(block[i + 1]) << 16) \
+                | (np.int64(block[i + 2]) << 8) | np.int64(block[i + 3])
+        for t in range(16, 64):
+            s0 = _rotr(w[t - 15], 7) ^ _rotr(w[t - 15], 18) ^ (w[t - 15] >> 3)
+            s1 = _rotr(w[t - 2], 17) ^ _rotr(w[t - 2], 19) ^ (w[t - 2] >> 10)
+            w[t] = (w[t - 16] + s0 + w[t - 7] + s1) & _MASK32
+        a, b, c, d, e, f, g, h = state[0], state[1], state[2], state[3], state[4], state[5], state[6], state[7]
+        for t in range(64):
+            s1 = _rotr(e, 6) ^ _rotr(e, 11) ^ _rotr(e, 25)
+            ch = (e & f) ^ ((e ^ _MASK32) & g)
+            t1 = (h + s1 + ch + k[t] + w[t]) & _MASK32
+            s0 = _rotr(a, 2) ^ _rotr(a, 13) ^ _rotr(a, 22)
+            maj = (a & b) ^ (a & c) ^ (b & c)
+            t2 = (s0 + maj) & _MASK32
+            h, g, f, e, d, c, b, a = g, f, e, (d + t1) & _MASK32, c, b, a, (t1 + t2) & _MASK32
+        state[0] = (state[0] + a) & _MASK32
+        state[1] = (state[1] + b) & _MASK32
+        state[2] = (state[2] + c) & _MASK32
+        state[3] = (state[3] + d) & _MASK32
+        state[4] = (state[4] + e) & _MASK32
+        state[5] = (state[5] + f) & _MASK32
+        state[6] = (state[6] + g) & _MASK32
+        state[7] = (state[7] + h) & _MASK32
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _leading_zero_nibbles(state, difficulty):
+        w = 0
+        while difficulty >= 8:
+            if state[w] != 0:
+                return False
+            w += 1
+            difficulty -= 8
+        if difficulty == 0:
+            return True
+        return (state[w] >> (32 - 4 * difficulty)) == 0
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _midstate(prefix, k, iv):
+        # Absorb every complete 64-byte block of the prefix; only the tail
+        # has to be hashed again for each nonce.
+        state = iv.copy()
+        w = np.empty(64, dtype=np.int64)
+        for blk in range(prefix.shape[0] // 64):
+            _compress(state, prefix, 64 * blk, w, k)
+        return state
+
+    @numba.njit(cache=True, nogil=True, parallel=True, boundscheck=False)
+    def _search_batch(midstate, tail, absorbed, difficulty, start, count, n_threads, k):
+        # Nonces are sharded across threads as start + tid, start + tid + P, ...
+        # and each thread stops at its first hit, so the batch minimum is the
+        # first valid proof in [start, start + count).
+        hits = np.full(n_threads, -1, dtype=np.int64)
+        tlen = tail.shape[0]
+        n_blocks = (tlen + 20 + 9 + 63) // 64
+        for tid in numba.prange(n_threads):
+            buf = np.zeros(64 * n_blocks, dtype=np.uint8)
+            buf[:tlen] = tail
+            digits = np.empty(20, dtype=np.uint8)
+            w = np.empty(64, dtype=np.int64)
+            state = np.empty(8, dtype=np.int64)
+            proof = start + tid
+            while proof < start + count:
+                v = proof
+                nd = 0
+                while True:
+                    digits[nd] = 48 + v % 10
+                    v //= 10
+                    nd += 1
+                    if v == 0:
+                        break
+                length = tlen + nd
+                for i in range(nd):
+                    buf[tlen + i] = digits[nd - 1 - i]
+                used = (length + 9 + 63) // 64
+                for i in range(length, 64 * used):
+                    buf[i] = 0
+                buf[length] = 0x80
+                bits = (absorbed + length) * 8
+                for i in range(8):
+                    buf[64 * used - 1 - i] = (bits >> (8 * i)) & 0xFF
+                state[:] = midstate
+                for blk in range(used):
+                    _compress(state, buf, 64 * blk, w, k)
+                if _leading_zero_nibbles(state, difficulty):
+                    hits[tid] = proof
+                    break
+                proof += n_threads
+        best = -1
+        for tid in range(n_threads):
+            if hits[tid] >= 0 and (best < 0 or hits[tid] < best):
+                best = hits[tid]
+        return best
+
+
+def _find_proof_numba(last_proof: int, difficulty: int) -> int:
+    prefix = np.frombuffer(b"%d" % last_proof, dtype=np.uint8)
+    absorbed = len(prefix) - len(prefix) % 64
+    midstate = _midstate(prefix, _K, _IV)
+    tail = prefix[absorbed:].copy()
+    n_threads = numba.get_num_threads()
+    start = 0
+    with _numba_lock:
+        while True:
+            proof = _search_batch(midstate, tail, absorbed, difficulty, start, _BATCH, n_threads, _K)
+            if proof >= 0:
+                return int(proof)
+            start += _BATCH
+
+
+# ------------------------
+# Pure-Python backend
+# ------------------------
+def _find_proof_py(last_proof: int, difficulty: int) -> int:
+    # Absorb the last_proof prefix once; each guess clones that state and
+    # only feeds the nonce digits, formatted straight to bytes.
+    clone = sha256(b"%d" % last_proof).copy
+    # difficulty hex zeros == difficulty // 2 zero bytes, plus a high nibble
+    # of zero in the next byte when difficulty is odd.
+    zero_bytes = bytes(difficulty // 2)
+    odd = difficulty & 1
+    n = len(zero_bytes)
+    proof = 0
+    while True:
+        h = clone()
+        h.update(b"%d" % proof)
+        digest = h.digest()
+        if digest.startswith(zero_bytes) and (not odd or digest[n] < 0x10):
+            return proof
+        proof += 1
+
+
+# ------------------------
+# Proof-of-work search
+# ------------------------
+def compile_valid_proof(difficulty: int) -> Callable[[int, int], bool]:
+    """Return a valid_proof(last_proof, proof) check for difficulty leading hex zeros.
+
+    Out-of-range difficulties give a check that always fails.
+    """
+    if not 0 <= difficulty <= 64:
+        return lambda last_proof, proof: False
+    # difficulty hex zeros == difficulty // 2 zero bytes, plus a zero high
+    # nibble in the next byte when difficulty is odd.
+    zero_bytes = bytes(difficulty // 2)
+    n = len(zero_bytes)
+    if not difficulty & 1:
+        def valid(last_proof: int, proof: int) -> bool:
+            return sha256(b"%d%d" % (last_proof, proof)).digest().startswith(zero_bytes)
+    else:
+        def valid(last_proof: int, proof: int) -> bool:
+            digest = sha256(b"%d%d" % (last_proof, proof)).digest()
+            return digest.startswith(zero_bytes) and digest[n] < 0x10
+
+    return valid
+
+
+def find_proof(last_proof: int, difficulty: int) -> int:
+    if not 0 <= difficulty <= 64:
+        # A 64-nibble digest can never satisfy this; searching would not end.
+        raise ValueError(f"difficulty must be between 0 and 64, got {difficulty}")
+    # The native kernel formats last_proof as an unsigned 64-bit integer.
+    if _native is not None and 0 <= last_proof < 2**64:
+        return _find_proof_native(last_proof, difficulty)
+    if numba is not None:
+        return _find_proof_numba(last_proof, difficulty)
+    return _find_proof_py(last_proof, difficulty)
+
+
+# ------------------------
+# Active backend
+# ------------------------
+def _openssl_version() -> str:
+    # hashlib links the same libcrypto as ssl; OpenSSL >= 1.1.1 uses SHA-NI when the CPU has it.
+    try:
+        import ssl
+    except ImportError:
+        return "unknown"
+    return ssl.OPENSSL_VERSION
+
+
+def _cpu_has_sha_ni() -> bool:
+    try:
+        with open("/proc/cpuinfo") as f:
+            return any(line.startswith("flags") and " sha_ni" in line for line in f)
+    except OSError:
+        return False
+
+
+if _native is not None:
+    BACKEND = "sha-ni" if _native.pow_backend() == 2 else "avx2"
+elif numba is not None:
+    BACKEND = "numba"
+else:
+    BACKEND = "hashlib"
+logger.info("proof-of-work backend: %s (CPU SHA-NI: %s, hashlib: %s)",
+            BACKEND, "yes" if _cpu_has_sha_ni() else "no", _openssl_version())
+
+if BACKEND == "numba":
+    # Compile (or load from the on-disk cache) now, so the first mine in the
+    # app does not stall on JIT compilation.
+    _find_proof_numba(0, 0)
@@ -0,0 +1,335 @@
+/*
+ * Proof-of-work search using the Intel SHA extensions.
+ *
+ * Build with `make` (the result is loaded by mining.py through ctypes):
+ *
+ *     cc -O3 -msse4 -msha -shared -fPIC -o libproofofwork.so pow_sha_ni.c
+ *
+ * The SHA-256 compression follows noloader/SHA-Intrinsics (public domain).
+ * CPUs without SHA-NI but with AVX2 use an 8-way kernel instead, which
+ * hashes eight nonces at once with one message per 32-bit lane.
+ */
+#include <stdint.h>
+#include <string.h>
+#include <cpuid.h>
+#include <immintrin.h>
+
+static const uint32_t K[64] = {
+    0x428A2F98, 0x71374491, 0xB5C0FBCF, 0xE9B5DBA5, 0x3956C25B, 0x59F111F1, 0x923F82A4, 0xAB1C5ED5,
+    0xD807AA98, 0x12835B01, 0x243185BE, 0x550C7DC3, 0x72BE5D74, 0x80DEB1FE, 0x9BDC06A7, 0xC19BF174,
+    0xE49B69C1, 0xEFBE4786, 0x0FC19DC6, 0x240CA1CC, 0x2DE92C6F, 0x4A7484AA, 0x5CB0A9DC, 0x76F988DA,
+    0x983E5152, 0xA831C66D, 0xB00327C8, 0xBF597FC7, 0xC6E00BF3, 0xD5A79147, 0x06CA6351, 0x14292967,
+    0x27B70A85, 0x2E1B2138, 0x4D2C6DFC, 0x53380D13, 0x650A7354, 0x766A0ABB, 0x81C2C92E, 0x92722C85,
+    0xA2BFE8A1, 0xA81A664B, 0xC24B8B70, 0xC76C51A3, 0xD192E819, 0xD6990624, 0xF40E3585, 0x106AA070,
+    0x19A4C116, 0x1E376C08, 0x2748774C, 0x34B0BCB5, 0x391C0CB3, 0x4ED8AA4A, 0x5B9CCA4F, 0x682E6FF3,
+    0x748F82EE, 0x78A5636F, 0x84C87814, 0x8CC70208, 0x90BEFFFA, 0xA4506CEB, 0xBEF9A3F7, 0xC67178F2,
+};
+
+static const uint32_t IV[8] = {
+    0x6A09E667, 0xBB67AE85, 0x3C6EF372, 0xA54FF53A, 0x510E527F, 0x9B05688C, 0x1F83D9AB, 0x5BE0CD19,
+};
+
+/*
+ * Compress one 64-byte block into each of LANES independent states.  The
+ * lanes share no data, so interleaving their rounds keeps the SHA units busy
+ * while each sha256rnds2 waits on the previous one in its own lane.
+ */
+#define LANES 2
+
+static inline void sha256_blocks(uint32_t state[LANES][8], const uint8_t block[LANES][64])
+{
+    const __m128i MASK = _mm_set_epi64x(0x0c0d0e0f08090a0bULL, 0x0405060700010203ULL);
+    __m128i STATE0[LANES], STATE1[LANES], ABEF_SAVE[LANES], CDGH_SAVE[LANES];
+    __m128i MSG[LANES], TMP[LANES];
+    __m128i M[LANES][4];
+    int g, l;
+
+    for (l = 0; l < LANES; l++) {
+        TMP[l] = _mm_loadu_si128((const __m128i *)&state[l][0]);
+        STATE1[l] = _mm_loadu_si128((const __m128i *)&state[l][4]);
+        TMP[l] = _mm_shuffle_epi32(TMP[l], 0xB1);                /* CDAB */
+        STATE1[l] = _mm_shuffle_epi32(STATE1[l], 0x1B);          /* EFGH */
+        STATE0[l] = _mm_alignr_epi8(TMP[l], STATE1[l], 8);       /* ABEF */
+        STATE1[l] = _mm_blend_epi16(STATE1[l], TMP[l], 0xF0);    /* CDGH */
+        ABEF_SAVE[l] = STATE0[l];
+        CDGH_SAVE[l] = STATE1[l];
+        for (g = 0; g < 4; g++)
+            M[l][g] = _mm_shuffle_epi8(_mm_loadu_si128((const __m128i *)(block[l] + 16 * g)), MASK);
+    }
+
+    /* Sixteen groups of four rounds; the message schedule for group g+1 is
+     * finished (msg2) and the one for group g+3 is started (msg1) while the
+     * rounds for group g run. */
+#pragma GCC unroll 16
+    for (g = 0; g < 16; g++) {
+        const __m128i k = _mm_loadu_si128((const __m128i *)&K[4 * g]);
+        for (l = 0; l < LANES; l++) {
+            MSG[l] = _mm_add_epi32(M[l][g & 3], k);
+            STATE1[l] = _mm_sha256rnds2_epu32(STATE1[l], STATE0[l], MSG[l]);
+        }
+        if (g >= 3 && g <= 14) {
+            for (l = 0; l < LANES; l++) {
+                TMP[l] = _mm_alignr_epi8(M[l][g & 3], M[l][(g + 3) & 3], 4);
+                M[l][(g + 1) & 3] = _mm_add_epi32(M[l][(g + 1) & 3], TMP[l]);
+                M[l][(g + 1) & 3] = _mm_sha256msg2_epu32(M[l][(g + 1) & 3], M[l][g & 3]);
+            }
+        }
+        for (l = 0; l < LANES; l++) {
+            MSG[l] = _mm_shuffle_epi32(MSG[l], 0x0E);
+            STATE0[l] = _mm_sha256rnds2_epu32(STATE0[l], STATE1[l], MSG[l]);
+        }
+        if (g >= 1 && g <= 12)
+            for (l = 0; l < LANES; l++)
+                M[l][(g + 3) & 3] = _mm_sha256msg1_epu32(M[l][(g + 3) & 3], M[l][g & 3]);
+    }
+
+    for (l = 0; l < LANES; l++) {
+        STATE0[l] = _mm_add_epi32(STATE0[l], ABEF_SAVE[l]);
+        STATE1[l] = _mm_add_epi32(STATE1[l], CDGH_SAVE[l]);
+        TMP[l] = _mm_shuffle_epi32(STATE0[l], 0x1B);             /* FEBA */
+        STATE1[l] = _mm_shuffle_epi32(STATE1[l], 0xB1);          /* DCHG */
+        STATE0[l] = _mm_blend_epi16(TMP[l], STATE1[l], 0xF0);    /* DCBA */
+        STATE1[l] = _mm_alignr_epi8(STATE1[l], TMP[l], 8);       /* ABEF */
+        _mm_storeu_si128((__m128i *)&state[l][0], STATE0[l]);
+        _mm_storeu_si128((__m128i *)&state[l][4], STATE1[l]);
+    }
+}
+
+/* Write the decimal digits of v to out, returning the number written. */
+static inline int u64_to_ascii(uint64_t v, uint8_t *out)
+{
+    uint8_t tmp[20];
+    int n = 0, i;
+    do {
+        tmp[n++] = (uint8_t)('0' + v % 10);
+        v /= 10;
+    } while (v);
+    for (i = 0; i < n; i++)
+        out[i] = tmp[n - 1 - i];
+    return n;
+}
+
+/* True when the digest starts with zero_nibbles hex zeros. */
+static inline int leading_zero_nibbles(const uint32_t state[8], int zero_nibbles)
+{
+    int w = 0;
+    for (; zero_nibbles >= 8; zero_nibbles -= 8)
+        if (state[w++])
+            return 0;
+    if (!zero_nibbles)
+        return 1;
+    return (state[w] & (0xFFFFFFFFu << (32 - 4 * zero_nibbles))) == 0;
+}
+
+int pow_has_sha_ni(void)
+{
+    unsigned int eax, ebx, ecx, edx;
+    if (!__get_cpuid_count(7, 0, &eax, &ebx, &ecx, &edx))
+        return 0;
+    return (ebx >> 29) & 1;
+}
+
+int pow_has_avx2(void)
+{
+    unsigned int eax, ebx, ecx, edx, xcr0_lo, xcr0_hi;
+    /* The OS must save YMM state (OSXSAVE, XCR0 bits 1-2) for AVX2 to be usable. */
+    if (!__get_cpuid(1, &eax, &ebx, &ecx, &edx) || !((ecx >> 27) & 1))
+        return 0;
+    __asm__("xgetbv" : "=a"(xcr0_lo), "=d"(xcr0_hi) : "c"(0));
+    if ((xcr0_lo & 6) != 6)
+        return 0;
+    if (!__get_cpuid_count(7, 0, &eax, &ebx, &ecx, &edx))
+        return 0;
+    return (ebx >> 5) & 1;
+}
+
+/* 2 = SHA-NI, 1 = AVX2 8-way, 0 = no usable kernel. */
+int pow_backend(void)
+{
+    static int backend = -1;
+    if (backend < 0)
+        backend = pow_has_sha_ni() ? 2 : pow_has_avx2() ? 1 : 0;
+    return backend;
+}
+
+/* Fill block with the padded message prefix || decimal(proof). */
+static inline void build_block(uint8_t block[64], int prefix_len, uint64_t proof)
+{
+    int len = prefix_len + u64_to_ascii(proof, block + prefix_len);
+    memset(block + len, 0, 64 - len);
+    block[len] = 0x80;
+    block[62] = (uint8_t)((len * 8) >> 8);
+    block[63] = (uint8_t)(len * 8);
+}
+
+/* Lower *best to v unless another thread already found something smaller. */
+static inline void update_min(uint64_t *best, uint64_t v)
+{
+    uint64_t cur = __atomic_load_n(best, __ATOMIC_RELAXED);
+    while (v < cur && !__atomic_compare_exchange_n(best, &cur, v, 1, __ATOMIC_RELAXED, __ATOMIC_RELAXED))
+        ;
+}
+
+/*
+ * Search for proofs such that sha256(f"{last_proof}{proof}") has
+ * zero_nibbles leading hex zeros, lowering *best to the smallest one found.
+ * At most 40 message bytes, so a single padded block always suffices.
+ *
+ * Nonces are handed out in groups of LANES; worker `start` of `stride`
+ * takes groups start, start + stride, ...  A worker stops once its next
+ * group is above *best, so when every worker has returned *best holds the
+ * lowest valid proof, exactly as a sequential scan would find it.
+ */
+static void search_proof_sha_ni(uint64_t last_proof, int zero_nibbles, uint64_t start, uint64_t stride,
+                                uint64_t *best)
+{
+    uint8_t block[LANES][64];
+    uint32_t state[LANES][8];
+    uint64_t proof;
+    int prefix_len, l;
+
+    prefix_len = u64_to_ascii(last_proof, block[0]);
+    for (l = 1; l < LANES; l++)
+        memcpy(block[l], block[0], prefix_len);
+    for (proof = start * LANES; proof < __atomic_load_n(best, __ATOMIC_RELAXED); proof += stride * LANES) {
+        for (l = 0; l < LANES; l++) {
+            build_block(block[l], prefix_len, proof + l);
+            memcpy(state[l], IV, sizeof(IV));
+        }
+        sha256_blocks(state, (const uint8_t (*)[64])block);
+        for (l = 0; l < LANES; l++) {
+            if (leading_zero_nibbles(state[l], zero_nibbles)) {
+                update_min(best, proof + l);
+                return;
+            }
+        }
+    }
+}
+
+#define AVX2 __attribute__((target("avx2")))
+#define AVX2_LANES 8
+
+AVX2 static inline __m256i rotr8(__m256i x, int n)
+{
+    return _mm256_or_si256(_mm256_srli_epi32(x, n), _mm256_slli_epi32(x, 32 - n));
+}
+
+/* One SHA-256 compression from the IV for eight messages, word t of message
+ * l in lane l of w[t]. */
+AVX2 static inline void sha256_8way(__m256i out[8], const __m256i msg[16])
+{
+    __m256i w[64], s[8], s0, s1, ch, maj, t1, t2;
+    int t;
+
+    for (t = 0; t < 16; t++)
+        w[t] = msg[t];
+    for (t = 16; t < 64; t++) {
+        s0 = _mm256_xor_si256(_mm256_xor_si256(rotr8(w[t - 15], 7), rotr8(w[t - 15], 18)),
+                              _mm256_srli_epi32(w[t - 15], 3));
+        s1 = _mm256_xor_si256(_mm256_xor_si256(rotr8(w[t - 2], 17), rotr8(w[t - 2], 19)),
+                              _mm256_srli_epi32(w[t - 2], 10));
+        w[t] = _mm256_add_epi32(_mm256_add_epi32(w[t - 16], s0), _mm256_add_epi32(w[t - 7], s1));
+    }
+    for (t = 0; t < 8; t++)
+        s[t] = _mm256_set1_epi32((int)IV[t]);
+    for (t = 0; t < 64; t++) {
+        /* s[0..7] = a..h */
+        s1 = _mm256_xor_si256(_mm256_xor_si256(rotr8(s[4], 6), rotr8(s[4], 11)), rotr8(s[4], 25));
+        ch = _mm256_xor_si256(_mm256_and_si256(s[4], s[5]), _mm256_andnot_si256(s[4], s[6]));
+        t1 = _mm256_add_epi32(_mm256_add_epi32(s[7], s1),
+                              _mm256_add_epi32(ch, _mm256_add_epi32(_mm256_set1_epi32((int)K[t]), w[t])));
+        s0 = _mm256_xor_si256(_mm256_xor_si256(rotr8(s[0], 2), rotr8(s[0], 13)), rotr8(s[0], 22));
+        maj = _mm256_xor_si256(_mm256_xor_si256(_mm256_and_si256(s[0], s[1]), _mm256_and_si256(s[0], s[2])),
+                               _mm256_and_si256(s[1], s[2]));
+        t2 = _mm256_add_epi32(s0, maj);
+        s[7] = s[6];
+        s[6] = s[5];
+        s[5] = s[4];
+        s[4] = _mm256_add_epi32(s[3], t1);
+        s[3] = s[2];
+        s[2] = s[1];
+        s[1] = s[0];
+        s[0] = _mm256_add_epi32(t1, t2);
+    }
+    for (t = 0; t < 8; t++)
+        out[t] = _mm256_add_epi32(s[t], _mm256_set1_epi32((int)IV[t]));
+}
+
+static inline uint32_t load_be32(const uint8_t *p)
+{
+    return (uint32_t)p[0] << 24 | (uint32_t)p[1] << 16 | (uint32_t)p[2] << 8 | p[3];
+}
+
+/* Same contract as search_proof_sha_ni, with groups of AVX2_LANES nonces. */
+AVX2 static void search_proof_avx2(uint64_t last_proof, int zero_nibbles, uint64_t start, uint64_t stride,
+                                   uint64_t *best)
+{
+    uint8_t block[AVX2_LANES][64];
+    __m256i msg[16], state[8];
+    const __m256i zero = _mm256_setzero_si256();
+    uint64_t proof;
+    int prefix_len, l, t, n, hits;
+
+    prefix_len = u64_to_ascii(last_proof, block[0]);
+    for (l = 1; l < AVX2_LANES; l++)
+        memcpy(block[l], block[0], prefix_len);
+    for (proof = start * AVX2_LANES; proof < __atomic_load_n(best, __ATOMIC_RELAXED); proof += stride * AVX2_LANES) {
+        for (l = 0; l < AVX2_LANES; l++)
+            build_block(block[l], prefix_len, proof + l);
+        for (t = 0; t < 16; t++)
+            msg[t] = _mm256_set_epi32(
+                (int)load_be32(block[7] + 4 * t), (int)load_be32(block[6] + 4 * t),
+                (int)load_be32(block[5] + 4 * t), (int)load_be32(block[4] + 4 * t),
+                (int)load_be32(block[3] + 4 * t), (int)load_be32(block[2] + 4 * t),
+                (int)load_be32(block[1] + 4 * t), (int)load_be32(block[0] + 4 * t));
+        sha256_8way(state, msg);
+
+        /* Bit l of hits is set while lane l still has enough leading zeros. */
+        hits = 0xFF;
+        for (t = 0, n = zero_nibbles; n >= 8; n -= 8, t++)
+            hits &= _mm256_movemask_ps(_mm256_castsi256_ps(_mm256_cmpeq_epi32(state[t], zero)));
+        if (n) {
+            const __m256i mask = _mm256_set1_epi32((int)(0xFFFFFFFFu << (32 - 4 * n)));
+            hits &= _mm256_movemask_ps(_mm256_castsi256_ps(
+                _mm256_cmpeq_epi32(_mm256_and_si256(state[t], mask), zero)));
+        }
+        if (hits) {
+            update_min(best, proof + __builtin_ctz(hits));
+            return;
+        }
+    }
+}
+
+/*
+ * Search with whichever kernel this CPU supports; see search_proof_sha_ni.
+ * Callers check pow_backend() first.
+ */
+void search_proof(uint64_t last_proof, int zero_nibbles, uint64_t start, uint64_t stride, uint64_t *best)
+{
+    if (pow_backend() == 2)
+        search_proof_sha_ni(last_proof, zero_nibbles, start, stride, best);
+    else
+        search_proof_avx2(last_proof, zero_nibbles, start, stride, best);
+}
+
+/*
+ * Single-threaded search on a given kernel (2 = SHA-NI, 1 = AVX2), so tests can
+ * cover both on a CPU that has both. The caller checks the CPU supports it.
+ */
+uint64_t find_proof_with(int backend, uint64_t last_proof, int zero_nibbles)
+{
+    uint64_t best = UINT64_MAX;
+    if (backend == 2)
+        search_proof_sha_ni(last_proof, zero_nibbles, 0, 1, &best);
+    else
+        search_proof_avx2(last_proof, zero_nibbles, 0, 1, &best);
+    return best;
+}
+
+/* Single-threaded search for the first valid proof. */
+uint64_t find_proof(uint64_t last_proof, int zero_nibbles)
+{
+    uint64_t best = UINT64_MAX;
+    search_proof(last_proof, zero_nibbles, 0, 1, &best);
+    return best;
+}
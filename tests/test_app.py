@@ -0,0 +1,146 @@
+import hashlib
+import json
+import random
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Streamlit runs the page in bare mode on import; only the module-level helpers are used here.
+import app  # noqa: E402
+
+
+def _block(transactions, **fields):
+    block = {"index": 2, "timestamp": 1700000000.123456, "transactions": transactions, "proof": 35293,
+             "previous_hash": "ab" * 32}
+    block.update(fields)
+    return block
+
+
+def _tx(sender="alice", recipient="bob", amount=1.5):
+    return {"sender": sender, "recipient": recipient, "amount": amount}
+
+
+# Blocks whose serialization could drift from json.dumps(sort_keys=True)
+STANDARD = {
+    "empty": _block([]),
+    "standard": _block([_tx(), _tx("0", "carol", 1)]),
+    "non-ascii": _block([_tx("Zoë", "学生", 2.0), _tx("😀", 'quote"back\\slash\ttab\n', 3)]),
+    "int-amounts": _block([_tx(amount=0), _tx(amount=-7), _tx(amount=10**9), _tx(amount=2**70)]),
+    "float-amounts": _block([_tx(amount=a) for a in (0.1, 0.2 + 0.1, -2.5, 123456789.123456, 1 / 3)]),
+    "exponent-floats": _block([_tx(amount=a) for a in (1e-07, -2.5e-05, 1e16, 1.5e300, -0.0, 5e-324)]),
+    "int-timestamp": _block([_tx()], timestamp=1700000000),
+    "huge-proof": _block([_tx()], proof=2**80),
+    "genesis": _block([], index=1, proof=100, previous_hash="1"),
+}
+# Shapes _canon does not write itself and hands to json.dumps
+FALLBACK = {
+    "extra-block-key": _block([_tx()], hash="ff" * 32),
+    "extra-tx-key": _block([dict(_tx(), memo="hi")]),
+    "missing-tx-key": _block([{"sender": "alice", "amount": 1.0}]),
+    "bool-amount": _block([_tx(amount=True)]),
+    "nan-amount": _block([_tx(amount=float("nan"))]),
+    "inf-timestamp": _block([_tx()], timestamp=float("inf")),
+    "none-previous-hash": _block([_tx()], previous_hash=None),
+    "int-address": _block([_tx(sender=42)]),
+    "str-amount": _block([_tx(amount="1.5")]),
+}
+BLOCKS = {**STANDARD, **FALLBACK}
+
+
+@pytest.mark.parametrize("block", BLOCKS.values(), ids=BLOCKS.keys())
+def test_canon_matches_json_dumps(block):
+    assert app._canon(block) == json.dumps(block, sort_keys=True).encode()
+
+
+@pytest.mark.parametrize("block", BLOCKS.values(), ids=BLOCKS.keys())
+def test_hash_matches_original(block):
+    expected = hashlib.sha256(json.dumps(block, sort_keys=True).encode()).hexdigest()
+    assert app.Blockchain.hash(block) == expected
+
+
+@pytest.mark.parametrize("block", STANDARD.values(), ids=STANDARD.keys())
+def test_canon_writes_standard_blocks_without_fallback(block, monkeypatch):
+    expected = json.dumps(block, sort_keys=True).encode()
+    monkeypatch.setattr(app, "json", None)  # a json.dumps fallback would now raise
+    assert app._canon(block) == expected
+
+
+def _replay(chain, pending):
+    """Balances the way the original compute_balance derived them, but in exact decimals."""
+    balances = {}
+    for tx in [tx for block in chain for tx in block["transactions"]] + pending:
+        amount = Decimal(repr(tx["amount"]))
+        balances[tx["sender"]] = balances.get(tx["sender"], 0) - amount
+        balances[tx["recipient"]] = balances.get(tx["recipient"], 0) + amount
+    return balances
+
+
+def _random_chain(seed, n_blocks=20):
+    rng = random.Random(seed)
+    users = ["alice", "bob", "carol", "Zoë"]
+    bc = app.Blockchain(difficulty=1)
+    for _ in range(n_blocks):
+        for _ in range(rng.randrange(6)):
+            bc.new_transaction(rng.choice(users), rng.choice(users), round(rng.uniform(0, 50), rng.randrange(7)))
+        bc.new_transaction("0", rng.choice(users), 1)
+        bc.new_block(proof=rng.randrange(10**6))
+    bc.new_transaction("alice", "bob", 0.25)  # left pending
+    return bc
+
+
+def _assert_matches_replay(bc):
+    expected = _replay(bc.chain, bc.current_transactions)
+    assert bc.all_balances() == {a: float(b) for a, b in expected.items() if a != "0"}
+    for address, balance in expected.items():
+        assert bc.compute_balance(address) == float(balance)
+    assert bc.compute_balance("nobody") == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_balances_match_replay(seed):
+    bc = _random_chain(seed)
+    _assert_matches_replay(bc)
+    # Rebuilding from a serialized copy, as the upload does, gives the same ledger
+    bc.replace_chain(json.loads(json.dumps(bc.chain)))
+    _assert_matches_replay(bc)
+
+
+@pytest.mark.parametrize("bad_tx", [
+    {"sender": "alice", "recipient": "bob", "amount": 1e13},
+    {"sender": "alice", "recipient": "bob", "amount": "abc"},
+    {"sender": "alice", "amount": 1.0},
+], ids=["out-of-range", "not-a-number", "missing-recipient"])
+def test_replace_chain_restores_state_on_error(bad_tx):
+    bc = _random_chain(7, n_blocks=5)
+    chain, hashes, pending = list(bc.chain), list(bc.block_hashes), list(bc.current_transactions)
+    balances = bc.all_balances()
+    bad_chain = json.loads(json.dumps(bc.chain))
+    bad_chain[-1]["transactions"].append(bad_tx)
+    with pytest.raises((KeyError, TypeError, ValueError)):
+        bc.replace_chain(bad_chain)
+    assert bc.chain == chain
+    assert bc.block_hashes == hashes
+    assert bc.current_transactions == pending
+    assert bc.all_balances() == balances
+    _assert_matches_replay(bc)
+    # The restored chain keeps growing from the old tip
+    bc.new_block(proof=1)
+    assert bc.chain[-1]["previous_hash"] == hashes[-1]
+    assert bc.block_hashes[-1] == app.Blockchain.hash(bc.chain[-1])
+
+
+def test_fractional_transfers_stay_exact():
+    bc = app.Blockchain(difficulty=1)
+    for i in range(10_000):
+        bc.new_transaction("alice", "bob", 0.1)
+        if i % 1000 == 999:
+            bc.new_block(proof=i)
+    assert sum([0.1] * 10_000) != 1000.0  # what a float running total would drift to
+    assert bc.compute_balance("bob") == 1000.0
+    assert bc.compute_balance("alice") == -1000.0
+    bc.replace_chain(json.loads(json.dumps(bc.chain)))
+    assert bc.all_balances() == {"alice": -1000.0, "bob": 1000.0}
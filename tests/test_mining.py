@@ -0,0 +1,62 @@
+import hashlib
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import mining  # noqa: E402
+
+# (last_proof, difficulty) pairs; 2**64 - 1 is the widest last_proof the native kernel takes.
+CASES = [(0, 0), (100, 0), (2**64 - 1, 0), (0, 1), (100, 2), (35293, 3), (2**64 - 1, 2), (2**64 - 1, 3),
+         (7, 4), (123456789, 4)]
+
+
+@lru_cache(maxsize=None)
+def reference_proof(last_proof: int, difficulty: int) -> int:
+    """The original hexdigest loop every backend must agree with."""
+    proof = 0
+    while hashlib.sha256(f"{last_proof}{proof}".encode()).hexdigest()[:difficulty] != "0" * difficulty:
+        proof += 1
+    return proof
+
+
+def _backends():
+    backends = [("hashlib", mining._find_proof_py)]
+    if mining.numba is not None:
+        backends.append(("numba", mining._find_proof_numba))
+    native = mining._native
+    if native is not None:
+        if native.pow_has_sha_ni():
+            backends.append(("sha-ni", lambda lp, d: native.find_proof_with(2, lp, d)))
+        if native.pow_has_avx2():
+            backends.append(("avx2", lambda lp, d: native.find_proof_with(1, lp, d)))
+        backends.append(("native-threads", mining._find_proof_native))
+    return backends
+
+
+@pytest.mark.parametrize("name,search", _backends(), ids=[name for name, _ in _backends()])
+@pytest.mark.parametrize("last_proof,difficulty", CASES)
+def test_backend_matches_reference(name, search, last_proof, difficulty):
+    assert search(last_proof, difficulty) == reference_proof(last_proof, difficulty)
+
+
+@pytest.mark.parametrize("last_proof,difficulty", CASES + [(2**64, 2), (10**30, 3)])
+def test_find_proof_matches_reference(last_proof, difficulty):
+    assert mining.find_proof(last_proof, difficulty) == reference_proof(last_proof, difficulty)
+
+
+@pytest.mark.parametrize("last_proof,difficulty", CASES)
+def test_compile_valid_proof(last_proof, difficulty):
+    valid = mining.compile_valid_proof(difficulty)
+    proof = reference_proof(last_proof, difficulty)
+    assert valid(last_proof, proof)
+    assert not any(valid(last_proof, p) for p in range(proof))
+
+
+@pytest.mark.parametrize("difficulty", [-1, 65])
+def test_find_proof_rejects_out_of_range_difficulty(difficulty):
+    with pytest.raises(ValueError):
+        mining.find_proof(0, difficulty)